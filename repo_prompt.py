@@ -15,77 +15,456 @@ and a tree structure showing the included files is prepended.
 import typer
 import sys
 import os
-import glob
+import re
+import stat
+import functools
+import collections
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Set, Optional
+from typing import BinaryIO, Iterator, List, Dict, NamedTuple, Optional, Set, Tuple, Union
 
 app = typer.Typer(
     help="Concatenates files into a single Markdown output with a file tree.",
     add_completion=False,
 )
 
-def build_tree_dict(paths: List[Path], common_base: Path) -> Dict[str, Any]:
-    """Builds a nested dictionary representing the file tree structure."""
-    tree: Dict[str, Any] = {}
-    for p in paths:
+_MAGIC_CHARS = set("*?[")
+
+def _split_pattern(pattern: str) -> Tuple[str, List[str]]:
+    """Splits a glob pattern into its literal anchor directory and the glob tail segments."""
+    if os.altsep:
+        pattern = pattern.replace(os.altsep, os.sep)
+    parts = pattern.split(os.sep)
+    for i, part in enumerate(parts):
+        if _MAGIC_CHARS.intersection(part):
+            anchor = os.sep.join(parts[:i])
+            if not anchor:
+                # Pattern is either relative to CWD ("*.py") or rooted ("/*.py")
+                anchor = os.sep if pattern.startswith(os.sep) else "."
+            tail = [p for p in parts[i:-1] if p] + parts[-1:]
+            # A trailing "" segment is kept: like glob, "dir/" style patterns only match directories
+            return anchor, tail
+    return pattern, [] # No glob characters: a plain path
+
+_SEP = re.escape(os.sep)
+_NOT_SEP = f"[^{_SEP}]"
+
+def _translate_set(stuff: str) -> str:
+    """Translates the inside of a glob bracket set to a regex, mirroring fnmatch.
+
+    Empty or reversed ranges are dropped instead of producing an invalid regex,
+    and negated sets never match a separator.
+    """
+    negated = stuff.startswith("!")
+    if "-" not in stuff:
+        chunks = [stuff]
+    else:
+        # Split on the hyphens that form ranges, like fnmatch does
+        chunks = []
+        i, j = 0, len(stuff)
+        k = 2 if negated else 1
+        while True:
+            k = stuff.find("-", k, j)
+            if k < 0:
+                break
+            chunks.append(stuff[i:k])
+            i = k + 1
+            k = k + 3
+        chunk = stuff[i:j]
+        if chunk:
+            chunks.append(chunk)
+        else:
+            chunks[-1] += "-"
+        # Remove empty ranges -- invalid in RE
+        for k in range(len(chunks) - 1, 0, -1):
+            if chunks[k - 1][-1] > chunks[k][0]:
+                chunks[k - 1] = chunks[k - 1][:-1] + chunks[k][1:]
+                del chunks[k]
+    if negated:
+        chunks[0] = chunks[0][1:]
+    # Escape everything special inside a set except the hyphens forming ranges
+    stuff = "-".join(re.sub(r"([\\\-\[\]&~|^])", r"\\\1", chunk) for chunk in chunks)
+    if negated:
+        return f"[^{_SEP}{stuff}]" # Negated sets must not match a separator either
+    if not stuff:
+        return "(?!)" # Empty range: never match
+    return f"[{stuff}]"
+
+def _translate_segment(segment: str) -> str:
+    """Translates one glob path segment to a regex whose wildcards never cross a separator."""
+    # Like glob, wildcards do not match a leading dot unless the pattern has one
+    res = [] if segment.startswith(".") else [r"(?!\.)"]
+    i, n = 0, len(segment)
+    while i < n:
+        c = segment[i]
+        i += 1
+        if c == "*":
+            if res[-1:] != [_NOT_SEP + "*"]: # Collapse runs of `*`
+                res.append(_NOT_SEP + "*")
+        elif c == "?":
+            res.append(_NOT_SEP)
+        elif c == "[":
+            j = i
+            if j < n and segment[j] == "!":
+                j += 1
+            if j < n and segment[j] == "]":
+                j += 1
+            while j < n and segment[j] != "]":
+                j += 1
+            if j >= n: # No closing bracket: match it literally
+                res.append(r"\[")
+                continue
+            res.append(_translate_set(segment[i:j]))
+            i = j + 1
+        else:
+            res.append(re.escape(c))
+    return "".join(res)
+
+def _translate_tail(tail: Tuple[str, ...]) -> str:
+    """Translates glob tail segments to a regex over the path relative to the anchor.
+
+    A trailing empty segment (pattern ending in a separator) only matches paths
+    ending in a separator, which the walk produces for directories only.
+    """
+    component = r"(?!\.)" + _NOT_SEP + "+"
+    res = []
+    for i, segment in enumerate(tail):
+        last = i == len(tail) - 1
+        if segment == "**":
+            # `**` spans zero or more directories, or everything below when trailing
+            res.append(f"{component}(?:{_SEP}{component})*" if last else f"(?:{component}{_SEP})*")
+        else:
+            res.append(_translate_segment(segment) + ("" if last else _SEP))
+    return "".join(res)
+
+class _WalkPlan(NamedTuple):
+    """Compiled matchers for all glob tails that share one anchor directory."""
+    combined: re.Pattern # Matches a relative path against any tail
+    bounded: Optional[re.Pattern] # Same, for tails without `**` only (None if there are none)
+    per_tail: Tuple[re.Pattern, ...] # Same, one regex per tail
+    # Per tail, by depth: regexes for the names of the directories it can descend into
+    dir_segments: Tuple[Tuple[re.Pattern, ...], ...]
+    # Per tail: depth from which its `**` descends into any directory; None if bounded
+    open_from: Tuple[Optional[int], ...]
+    # Per tail: whether hidden directories may be entered below its `**`
+    hidden_ok: Tuple[bool, ...]
+    # Per tail, by depth: the name if that segment is literal, else None
+    literals: Tuple[Tuple[Optional[str], ...], ...]
+
+@functools.lru_cache(maxsize=128)
+def _compile_tails(tails: Tuple[Tuple[str, ...], ...]) -> _WalkPlan:
+    """Compiles glob tails into the regexes used to walk and match below their anchor."""
+    translated = [_translate_tail(tail) for tail in tails]
+    dir_segments, open_from, hidden_ok, literals = [], [], [], []
+    for tail in tails:
+        segments = tail[:-1] if tail[-1] == "" else tail # Drop the "dir/" marker
+        fixed = segments[:segments.index("**")] if "**" in segments else segments
+        literals.append(tuple(None if _MAGIC_CHARS.intersection(s) else s for s in fixed))
+        if "**" in segments:
+            first = segments.index("**")
+            open_from.append(first)
+            hidden_ok.append(any(s.startswith(".") for s in segments[first:]))
+            segments = segments[:first]
+        else:
+            open_from.append(None)
+            hidden_ok.append(False)
+            segments = segments[:-1] # The last segment names the match itself
+        dir_segments.append(tuple(re.compile(_translate_segment(s) + r"\Z") for s in segments))
+    bounded = [t for t, tail in zip(translated, tails) if "**" not in tail]
+    return _WalkPlan(
+        combined=re.compile("(?:" + "|".join(translated) + r")\Z"),
+        bounded=re.compile("(?:" + "|".join(bounded) + r")\Z") if bounded else None,
+        per_tail=tuple(re.compile(f"(?:{t})\\Z") for t in translated),
+        dir_segments=tuple(dir_segments),
+        open_from=tuple(open_from),
+        hidden_ok=tuple(hidden_ok),
+        literals=tuple(literals),
+    )
+
+class _PathEntry:
+    """Minimal os.DirEntry stand-in for a literal path component, found without listing its parent."""
+    __slots__ = ("path", "name", "_lstat", "_stat")
+
+    def __init__(self, path: str, name: str, lstat: os.stat_result):
+        self.path, self.name, self._lstat, self._stat = path, name, lstat, None
+
+    def is_symlink(self) -> bool:
+        return stat.S_ISLNK(self._lstat.st_mode)
+
+    def stat(self) -> os.stat_result:
+        if not self.is_symlink():
+            return self._lstat
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+    def is_dir(self) -> bool:
         try:
-            relative_path = p.relative_to(common_base)
-        except ValueError:
-            # Should not happen if common_base is correctly determined,
-            # but handle defensively maybe showing path from root or just filename
-            relative_path = Path(p.name) # Fallback to just filename
-
-        parts = relative_path.parts
-        node = tree
-        for i, part in enumerate(parts):
-            if i == len(parts) - 1:  # It's the file
-                node[part] = True  # Mark as file entry (value doesn't strictly matter)
-            else:  # It's a directory
-                node = node.setdefault(part, {}) # Get or create subdir node
-                if node is True: # Error: Found a file where a directory was expected
-                     print(f"Error: Path conflict processing {relative_path}. Is '{part}' both a file and directory in the input list?", file=sys.stderr)
-                     # Overwrite file entry with directory dict - might be imperfect but tries to proceed
-                     node = {}
-                     # Re-point the parent's reference if needed (complex, easier to rely on setdefault)
-                     # Let's assume setdefault handles the basics if key exists.
-                     # We might need to re-insert the node into the parent if overwritten.
-                     # Simpler: rely on sorted inputs potentially avoiding this? Or pre-validate paths.
-                     # For this tool's scope, this conflict is unlikely unless user provides odd input.
-
-    return tree
-
-def format_tree(tree_dict: Dict[str, Any], common_base: Path) -> str:
-    """Formats the tree dictionary into a printable string."""
-    tree_lines: List[str] = []
-
-    # Determine root display name
-    cwd = Path.cwd()
+            return stat.S_ISDIR(self.stat().st_mode)
+        except OSError:
+            return False
+
+def _literal_names(plan: _WalkPlan, alive: List[int], depth: int) -> Optional[Set[str]]:
+    """Returns the names every alive tail requires at this depth, or None if any is a wildcard."""
+    names = set()
+    for i in alive:
+        literals = plan.literals[i]
+        if depth >= len(literals) or literals[depth] is None:
+            return None
+        names.add(literals[depth])
+    return names
+
+def _scandir_recursive(
+    root: str, plan: _WalkPlan, alive: List[int], depth: int = 0, via_link: bool = False
+) -> Iterator[Tuple[Union[os.DirEntry, _PathEntry], bool]]:
+    """Yields (DirEntry, reached through a symlinked directory) below root.
+
+    Only directories that some tail can match are entered.
+
+    alive lists the tails whose directory segments matched the path so far. A
+    subdirectory is entered only if one of them matches its name at this depth,
+    or has reached its `**`. Like glob, symlinked directories are followed for
+    bounded tails; `**` does not follow them, as a link cycle would never end.
+    When every alive tail names a literal component here, those paths are
+    lstat'ed directly instead of listing the whole directory.
+    """
+    entries: List[Union[os.DirEntry, _PathEntry]] = []
+    names = _literal_names(plan, alive, depth)
+    if names is not None:
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                entries.append(_PathEntry(path, name, os.lstat(path)))
+            except OSError:
+                pass
+    else:
+        try:
+            with os.scandir(root) as it:
+                entries = list(it)
+        except OSError:
+            return
+    for entry in entries:
+        yield entry, via_link
+        if not entry.is_dir():
+            continue
+        name = entry.name
+        wanted = []
+        for i in alive:
+            segments = plan.dir_segments[i]
+            if depth < len(segments):
+                if not segments[depth].match(name):
+                    continue
+            elif plan.open_from[i] is None or (name.startswith(".") and not plan.hidden_ok[i]):
+                continue
+            wanted.append(i)
+        if not wanted:
+            continue
+        if entry.is_symlink():
+            wanted = [i for i in wanted if plan.open_from[i] is None]
+            if wanted:
+                yield from _scandir_recursive(entry.path, plan, wanted, depth + 1, True)
+        else:
+            yield from _scandir_recursive(entry.path, plan, wanted, depth + 1, via_link)
+
+_READ_CHUNK_SIZE = 64 * 1024
+
+# Readahead hints; posix_fadvise is only available on some platforms (e.g. Linux)
+_posix_fadvise = getattr(os, "posix_fadvise", None)
+# Files at least this large have their cached pages dropped after reading
+_DONTNEED_MIN_SIZE = 1024 * 1024
+
+def _advise(fd: int, advice_name: str) -> None:
+    """Passes an access-pattern hint for fd to the kernel, if supported. Failures are harmless."""
+    if _posix_fadvise is not None:
+        try:
+            _posix_fadvise(fd, 0, 0, getattr(os, advice_name))
+        except OSError:
+            pass
+
+def _read_file(path: str, size: int) -> bytes:
+    """Reads a whole file with a single read() sized from its known stat size."""
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
     try:
-        # Try to show path relative to current directory if possible
-        root_display_name = str(common_base.relative_to(cwd))
-        if root_display_name == ".":
-            root_display_name = common_base.name or "." # Use dir name if not CWD itself
-    except ValueError:
-        # If not relative to CWD, show absolute path or just the name
-        root_display_name = str(common_base)
-
-    tree_lines.append(root_display_name)
-
-    def generate_lines(node: Dict[str, Any], prefix: str = ""):
-        items = sorted(node.keys())
-        pointers = ["├── "] * (len(items) - 1) + ["└── "]
-        for i, name in enumerate(items):
-            pointer = pointers[i]
-            tree_lines.append(f"{prefix}{pointer}{name}")
-
-            child_node = node[name]
-            if isinstance(child_node, dict):  # It's a directory node
-                extension = "│   " if i < len(items) - 1 else "    "
-                generate_lines(child_node, prefix + extension)
-
-    generate_lines(tree_dict)
+        # Each file is read start to end exactly once: ask for a larger readahead
+        # window, then drop the pages of large files so huge inputs don't evict the
+        # user's page cache. Small files are kept cached for the next run.
+        _advise(fd, "POSIX_FADV_SEQUENTIAL")
+        chunks = [os.read(fd, size + 1)]
+        if len(chunks[0]) != size:
+            # Short read, or the file changed since it was stat'ed: read the rest until EOF
+            while chunks[-1]:
+                chunks.append(os.read(fd, _READ_CHUNK_SIZE))
+        if size >= _DONTNEED_MIN_SIZE:
+            _advise(fd, "POSIX_FADV_DONTNEED")
+        return b"".join(chunks)
+    finally:
+        os.close(fd)
+
+_MAX_READ_WORKERS = 32
+
+def _iter_file_contents(paths: List[str], stats: Dict[str, os.stat_result]) -> Iterator[Tuple[str, Union[bytes, Exception]]]:
+    """Yields (path, content or read error) in input order, reading ahead on a thread pool.
+
+    Threads release the GIL around read(), so latency-bound reads (network file
+    systems, spinning disks) overlap. Only a bounded window of reads is in flight,
+    keeping memory use independent of the number of files.
+    """
+    def read(path: str) -> Union[bytes, Exception]:
+        try:
+            return _read_file(path, stats[path].st_size)
+        except Exception as e:
+            return e
+
+    if len(paths) == 1:
+        yield paths[0], read(paths[0])
+        return
+
+    workers = min(_MAX_READ_WORKERS, len(paths))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        remaining = iter(paths)
+        in_flight = collections.deque(
+            (path, executor.submit(read, path)) for path in itertools.islice(remaining, 2 * workers)
+        )
+        while in_flight:
+            path, future = in_flight.popleft()
+            next_path = next(remaining, None)
+            if next_path is not None: # Keep the read-ahead window full
+                in_flight.append((next_path, executor.submit(read, next_path)))
+            yield path, future.result()
+
+def _path_sort_key(path_str: str) -> str:
+    """Sort key that orders path strings component-wise, like Path objects compare.
+
+    Mapping the separator to "\\0" makes it sort before every other character,
+    so "pkg/x" sorts before "pkg-x" and "pkg.py", exactly as ("pkg", "x") would.
+    """
+    return path_str.replace(os.sep, "\0")
+
+def _relative_offset(paths: List[str], common_base: str) -> int:
+    """Returns how many leading characters to slice off each path to make it relative.
+
+    Decided once for the whole sorted list instead of per path: if the first and
+    last paths are under the base, every path in between is too. Otherwise (e.g.,
+    the different-drive fallback base) paths are shown in full.
+    """
+    base_str = os.path.join(common_base, "") # With trailing separator, also for the root
+    if paths[0].startswith(base_str) and paths[-1].startswith(base_str):
+        return len(base_str)
+    return 0
+
+def build_tree(paths: List[str], common_base: str) -> Tuple[List[str], List[List[int]]]:
+    """Builds the file tree as an adjacency list of integer node IDs; node 0 is the root.
+
+    Paths must be sorted component-wise (see _path_sort_key), so children are
+    appended in display order and never need sorting afterwards. It also means
+    a directory is never revisited once left, so only the directories shared
+    with the previous path need to be tracked; no lookup table is required.
+    """
+    names: List[str] = [""]
+    children: List[List[int]] = [[]]
+    chain: List[int] = [0] # Node IDs along the previous path, starting at the root
+    prev_parts: List[str] = []
+    base_len = _relative_offset(paths, common_base)
+    for path_str in paths:
+        parts = path_str[base_len:].split(os.sep)
+
+        # Count the leading directories shared with the previous path (never the file itself)
+        shared = 0
+        limit = min(len(parts), len(prev_parts)) - 1
+        while shared < limit and parts[shared] == prev_parts[shared]:
+            shared += 1
+        del chain[shared + 1:]
+
+        for part in parts[shared:]: # Everything past the shared directories is new
+            node_id = len(names)
+            names.append(sys.intern(part)) # Repeated names like "src" share one object
+            children.append([])
+            children[chain[-1]].append(node_id)
+            chain.append(node_id)
+        prev_parts = parts
+
+    return names, children
+
+def format_tree_root(common_base: str) -> str:
+    """Returns the display name for the root line of the tree."""
+    cwd = os.getcwd()
+    if common_base == cwd:
+        return os.path.basename(common_base) or "." # Use dir name if not CWD itself
+    # Try to show path relative to current directory if possible
+    cwd_prefix = os.path.join(cwd, "")
+    if common_base.startswith(cwd_prefix):
+        return common_base[len(cwd_prefix):]
+    # If not relative to CWD, show absolute path
+    return common_base
+
+def format_tree(tree: Tuple[List[str], List[List[int]]], common_base: str) -> str:
+    """Formats the adjacency-list tree into a printable string."""
+    names, children = tree
+    tree_lines: List[str] = [format_tree_root(common_base)]
+
+    # Iterative pre-order walk to avoid a Python call per directory.
+    # Stack entries are (node, prefix for its own line, prefix for its children).
+    stack: List[Tuple[int, str, str]] = [(0, "", "")]
+    while stack:
+        node, line_prefix, prefix = stack.pop()
+        if node: # The root itself is the display-name line added above
+            tree_lines.append(line_prefix + names[node])
+
+        items = children[node] # Already in sorted order, see build_tree
+        if items:  # It's a directory node
+            # Every child shares one of two prefix pairs, built once here. Children are
+            # pushed in reverse so they pop in display order.
+            branch, extension = prefix + "├── ", prefix + "│   "
+            stack.append((items[-1], prefix + "└── ", prefix + "    "))
+            stack.extend([(child, branch, extension) for child in items[-2::-1]])
+
     return "\n".join(tree_lines)
 
+def write_output(
+    out: BinaryIO,
+    tree_output: str,
+    paths: List[str],
+    stats: Dict[str, os.stat_result],
+    common_base: str,
+) -> None:
+    """Streams the tree followed by each file's fenced content to a binary stream.
+
+    Files are written one at a time as their reads complete, so only a small
+    window of file contents is held in memory regardless of how many files
+    are concatenated.
+    """
+    base_len = _relative_offset(paths, common_base)
+    stderr = sys.stderr
+    fsencode = os.fsencode
+    out.write(tree_output.encode("utf-8"))
+    for p, data in _iter_file_contents(paths, stats):
+        if isinstance(data, Exception):
+            stderr.write(f"Warning: Could not read or process file {p}: {data}\n")
+            continue
+        try:
+            try:
+                # Validate as UTF-8 without keeping the decoded text; ASCII needs no check.
+                if not data.isascii():
+                    data.decode("utf-8")
+            except UnicodeDecodeError:
+                data = b"[non-text content]"
+                stderr.write(f"Warning: File '{p}' is not valid UTF-8. Content replaced with placeholder.\n")
+            if b"\r" in data: # Universal newlines, like read_text()
+                data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+            # Path to display in fence, relative to common base
+            fence_prefix = b"\n\n```" + fsencode(p[base_len:]) + b"\n"
+        except Exception as e:
+            stderr.write(f"Warning: Could not read or process file {p}: {e}\n")
+            continue
+        # Separate writes into the buffered stream instead of concatenating, which
+        # would copy each file's content once more before it is written
+        out.write(fence_prefix)
+        out.write(data.strip())
+        out.write(b"\n```")
+    out.write(b"\n")
+
 @app.command()
 def main(
     files: List[str] = typer.Argument( # Changed from List[Path] to List[str]
@@ -114,113 +493,160 @@ def main(
         print("No input file patterns specified.", file=sys.stderr)
         raise typer.Exit(code=1)
 
-    expanded_files: Set[Path] = set()
+    # Bound once here, as the loops below may touch them for every matched file
+    stderr = sys.stderr
+    cwd = os.getcwd()
+    access, R_OK = os.access, os.R_OK
+
+    # Glob patterns are grouped by anchor directory so each tree is walked only once
+    tails_by_anchor: Dict[str, List[Tuple[str, Tuple[str, ...]]]] = {}
+    unmatched_patterns = set()
+    candidates: List[Tuple[str, Optional[os.stat_result]]] = []
     for pattern in files:
-        # Expand globs. If it's a specific file path without glob characters,
-        # glob.glob will return it as a list containing just that path.
-        # Using recursive=True for `**` support if needed, though not explicitly requested.
-        # For simplicity, let's assume simple globs for now, or user can use `**` if their shell doesn't expand it.
-        # Path.glob can also be used: Path(".").glob(pattern)
-        # However, glob.glob handles absolute patterns more directly.
-        
-        # If pattern is an absolute path, glob works fine.
+        # If pattern is an absolute path, it is walked from its literal anchor directory.
         # If pattern is relative, it's relative to CWD.
-        matched_files = glob.glob(pattern, recursive=True)
-        if not matched_files:
-            print(f"Warning: Pattern '{pattern}' did not match any files.", file=sys.stderr)
-            
-        for f_str in matched_files:
-            p = Path(f_str).resolve()
-            if not p.exists():
-                # This should ideally not happen if glob found it, but good for sanity.
-                print(f"Warning: File '{p}' found by glob but does not exist upon resolution. Skipping.", file=sys.stderr)
-                continue
-            if not p.is_file():
-                print(f"Warning: Path '{p}' matched by glob is not a file. Skipping.", file=sys.stderr)
-                continue
-            if not os.access(p, os.R_OK):
-                print(f"Warning: File '{p}' is not readable. Skipping.", file=sys.stderr)
+        anchor, tail = _split_pattern(pattern)
+        # Made absolute once per pattern (pure string normalization, no syscalls),
+        # so every path found below it is already absolute
+        anchor = os.path.abspath(anchor)
+        if tail:
+            tails_by_anchor.setdefault(anchor, []).append((pattern, tuple(tail)))
+            continue
+        # Plain path without glob characters: no directory walk needed.
+        # A trailing separator is lost by abspath but must still be stat'ed, so
+        # that "file.txt/" matches nothing, like glob.
+        dirs_only = pattern.endswith(os.sep) or bool(os.altsep and pattern.endswith(os.altsep))
+        try:
+            candidates.append((anchor, os.stat(os.path.join(anchor, "") if dirs_only else anchor)))
+        except OSError:
+            unmatched_patterns.add(pattern)
+
+    for anchor, group in tails_by_anchor.items():
+        tails = tuple(tail for _, tail in group)
+        plan = _compile_tails(tails)
+        match_dirs = any(tail[-1] == "" for tail in tails)
+        prefix = anchor if anchor.endswith(os.sep) else anchor + os.sep
+
+        pending = set(range(len(group))) # Patterns that have not matched anything yet
+        for entry, via_link in _scandir_recursive(anchor, plan, list(range(len(tails)))):
+            rel_path = entry.path[len(prefix):]
+            # Directories are also tried with a trailing separator, for "dir/" style patterns
+            rel_paths = (rel_path, rel_path + os.sep) if match_dirs and entry.is_dir() else (rel_path,)
+            # Below a symlinked directory only bounded tails apply, as `**` does not follow links
+            matcher = plan.bounded if via_link else plan.combined
+            if not any(matcher.match(r) for r in rel_paths):
                 continue
-            expanded_files.add(p)
+            if pending:
+                pending.difference_update([
+                    i for i in pending
+                    if not (via_link and plan.open_from[i] is not None)
+                    and any(plan.per_tail[i].match(r) for r in rel_paths)
+                ])
+            try:
+                candidates.append((entry.path, entry.stat()))
+            except OSError: # e.g. a dangling symlink
+                candidates.append((entry.path, None))
+        unmatched_patterns.update(group[i][0] for i in pending)
+
+    for pattern in files:
+        if pattern in unmatched_patterns:
+            stderr.write(f"Warning: Pattern '{pattern}' did not match any files.\n")
+
+    # Absolute path -> stat result, so later stages never stat the same file again.
+    # Paths are deduplicated without resolve(), which would cost a stat per component.
+    expanded_files: Dict[str, os.stat_result] = {}
+    # The output file is truncated before the inputs are streamed, so it must not be
+    # one of them (the tool would read its own half-written output)
+    output_id: Optional[Tuple[int, int]] = None
+    if output_file:
+        try:
+            output_st = os.stat(output_file)
+            output_id = (output_st.st_dev, output_st.st_ino)
+        except OSError: # Doesn't exist yet, so it can't have been matched
+            pass
+    else:
+        # Stdout redirected to a regular file (`> out.txt`) must not be read back in either
+        try:
+            output_st = os.fstat(sys.stdout.fileno())
+            if stat.S_ISREG(output_st.st_mode):
+                output_id = (output_st.st_dev, output_st.st_ino)
+        except (OSError, ValueError): # Stdout has no file descriptor
+            pass
+
+    for f_str, st in candidates:
+        if output_id is not None and st is not None and (st.st_dev, st.st_ino) == output_id:
+            stderr.write(f"Warning: File '{f_str}' is the output file. Skipping.\n")
+            continue
+        if st is None or not stat.S_ISREG(st.st_mode):
+            stderr.write(f"Warning: Path '{f_str}' matched by glob is not a file. Skipping.\n")
+            continue
+        if not access(f_str, R_OK):
+            stderr.write(f"Warning: File '{f_str}' is not readable. Skipping.\n")
+            continue
+        expanded_files[f_str] = st
 
     if not expanded_files:
         print("No valid files found after expanding patterns.", file=sys.stderr)
         raise typer.Exit(code=1)
 
-    # Convert set of resolved Path objects to a sorted list for consistent order
-    absolute_paths = sorted(list(expanded_files))
+    # Sort the absolute path strings for consistent order; paths stay plain str from here on
+    absolute_paths = sorted(expanded_files, key=_path_sort_key)
+
+    # The same file can be reached through a symlinked directory (or a hard link);
+    # emit it once, preferring the path without symlinks, else the first in sorted order
+    seen: Dict[Tuple[int, int], str] = {}
+    for f_str in absolute_paths:
+        st = expanded_files[f_str]
+        key = (st.st_dev, st.st_ino)
+        first = seen.setdefault(key, f_str)
+        if first is f_str:
+            continue
+        if os.path.realpath(f_str) == f_str and os.path.realpath(first) != first:
+            seen[key], f_str = f_str, first
+        stderr.write(f"Warning: File '{f_str}' is the same file as '{seen[key]}'. Skipping.\n")
+        del expanded_files[f_str]
+    if len(expanded_files) < len(absolute_paths):
+        absolute_paths = [f_str for f_str in absolute_paths if f_str in expanded_files]
 
-    # Find common base directory
+    # Find common base directory and generate the tree
     if len(absolute_paths) == 1:
-        # If only one file, its parent directory is the base
-        common_base = absolute_paths[0].parent
+        # If only one file, its parent directory is the base and the tree is a single
+        # entry, so skip commonpath and tree building entirely
+        common_base, name = os.path.split(absolute_paths[0])
+        tree_output = f"{format_tree_root(common_base)}\n└── {name}"
     else:
-        # Use os.path.commonpath for multiple files
+        # Use os.path.commonpath for multiple files. The list is sorted component-wise,
+        # so the common prefix of the first and last paths is shared by all of them.
         try:
-            common_str = os.path.commonpath([str(p) for p in absolute_paths])
-            common_base = Path(common_str)
-            # Ensure common_base is actually a directory, if not, use its parent
-            # (commonpath might return a file if all paths point to the same file,
-            # or a non-existent path segment if inputs are diverse like /a/b and /a/c/d)
-            # Let's refine: check if it exists and is a directory. If not, go up.
-            while not common_base.is_dir():
-                common_base = common_base.parent
-                if common_base == common_base.parent: # Reached root (e.g., '/')
-                     break
+            common_base = os.path.commonpath([absolute_paths[0], absolute_paths[-1]])
+            # The common prefix of distinct files is a directory on their own paths; only
+            # guard against it being one of the input files, using the stats we already have.
+            while common_base in expanded_files:
+                common_base = os.path.dirname(common_base)
         except ValueError:
             # This can happen if paths are on different drives on Windows.
             # Fallback to current working directory as base? Or error out?
             print("Error: Cannot determine a common path for input files (possibly on different drives?).", file=sys.stderr)
             # Let's try using CWD as a base for display purposes, paths will be absolute/relative to CWD then.
-            common_base = Path.cwd()
+            common_base = cwd
             print(f"Warning: Using current directory '{common_base}' as fallback base for tree display.", file=sys.stderr)
 
+        tree = build_tree(absolute_paths, common_base)
+        tree_output = format_tree(tree, common_base)
 
-    # --- Generate Tree ---
-    tree_dict = build_tree_dict(absolute_paths, common_base)
-    tree_output = format_tree(tree_dict, common_base)
-
-    # --- Generate Concatenated Content ---
-    concatenated_content: List[str] = []
-    for p in absolute_paths:
-        try:
-            content: str
-            try:
-                # Attempt to read as UTF-8.
-                content = p.read_text(encoding="utf-8")
-            except UnicodeDecodeError:
-                content = "[non-text content]"
-                print(f"Warning: File '{p}' is not valid UTF-8. Content replaced with placeholder.", file=sys.stderr)
-            # If other exceptions (e.g., PermissionError) occur during p.read_text(),
-            # they will be caught by the outer `except Exception as e`.
-
-            # Determine path to display in fence (relative to common base)
-            try:
-                fence_id = p.relative_to(common_base)
-            except ValueError:
-                # Fallback if path isn't relative (e.g., different drive case)
-                # Try relative to CWD or just show absolute path or filename?
-                fence_id = p # Absolute path
-
-
-            fence = f"```{fence_id}\n{content.strip()}\n```"
-            concatenated_content.append(fence)
-        except Exception as e:
-            print(f"Warning: Could not read or process file {p}: {e}", file=sys.stderr)
-
-    # --- Combine and Output ---
-    final_output = tree_output + "\n\n" + "\n\n".join(concatenated_content)
-
+    # --- Generate and Stream Output ---
     if output_file:
         try:
-            output_file.write_text(final_output + "\n")
+            with output_file.open("wb") as out:
+                write_output(out, tree_output, absolute_paths, expanded_files, common_base)
             print(f"Output successfully written to {output_file}", file=sys.stderr)
         except Exception as e:
             print(f"Error: Could not write to output file {output_file}: {e}", file=sys.stderr)
             raise typer.Exit(code=1)
     else:
-        # Print to stdout
-        print(final_output)
+        # Write to stdout
+        write_output(sys.stdout.buffer, tree_output, absolute_paths, expanded_files, common_base)
+        sys.stdout.buffer.flush()
 
 
 if __name__ == "__main__":